@@ -1,12 +1,15 @@
 import azure.functions as func
 import logging
 import json
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
 import os
 import joblib  # モデルの読み込みに必要
-import pandas as pd
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter, Retry
 
 # Azure Functions アプリケーションのインスタンスを作成
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
@@ -23,47 +26,225 @@ OPENWEATHER_CITY = os.environ.get("OPENWEATHER_CITY")
 BASE_FEATURES = ["平均気温(℃)", "曜日", "月", "天気(1-5)"]
 FEATURE_COLS = ["来客数", "総杯数", "平均気温(℃)", "曜日", "月", "天気(1-5)"]
 
-# 天気コードのマッピング
-WEATHER_CODE_MAP = {
-    "thunderstorm": 1, "drizzle": 1, "rain": 1, "light rain": 1,
-    "moderate rain": 1, "shower rain": 1, "overcast clouds": 2,
-    "broken clouds": 2, "scattered clouds": 3, "few clouds": 4,
-    "clear sky": 5
-}
+# 天気コード (1-5) は OpenWeather の数値 id から求める。
+# id の区分は安定している (2xx=雷雨, 3xx=霧雨, 5xx=雨, 6xx=雪, 7xx=大気現象,
+# 800=快晴, 80x=雲)。以前の説明文字列→コードの辞書引きは、辞書にない文言が
+# すべて「曇り」扱いになる欠点があった。
+def _weather_code_from_id(weather_id):
+    if weather_id < 700:
+        return 1  # 雷雨・霧雨・雨・雪
+    if weather_id == 800:
+        return 5  # 快晴
+    if weather_id >= 803:
+        return 2  # 曇天
+    if weather_id == 802:
+        return 3  # 散らばった雲
+    return 4  # 薄い雲 (801)・大気現象 (7xx)
 
 # ビール販売量予測モデルの入力に必要なため、学習時の平均値を使う。
 AVG_VISITORS = 13
 AVG_CUPS = 22
 
+# JSON の入出力は orjson（Rust 実装。常に UTF-8 なので ensure_ascii 不要）を
+# 優先し、未インストールの環境では stdlib の json にフォールバックする
+try:
+    import orjson
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+
+    def _json_loads(data):
+        return json.loads(data)
+
+
+# 予測値の 丸め→0下限クランプ→int32化 を1パスに融合したカーネル。
+# numba が使える環境では JIT 版（中間配列を作らない）を、なければ numpy 版を使う。
+try:
+    from numba import njit, prange
+
+    @njit(cache=True, parallel=True)
+    def _clamp_round_i32(a):
+        out = np.empty(a.shape, np.int32)
+        for i in prange(a.shape[0]):
+            for j in range(a.shape[1]):
+                v = a[i, j]
+                out[i, j] = 0 if v < 0.5 else int(v + 0.5)
+        return out
+
+    # 初回リクエストにコンパイル時間を載せないよう、インポート時にウォームアップ
+    _clamp_round_i32(np.zeros((1, 1)))
+except ImportError:
+    def _clamp_round_i32(a):
+        return np.maximum(0, np.round(a)).astype(np.int32)
+
+
+# sklearn のツリー系 predict は C 実装部分で GIL を解放するため、ビールモデルが
+# 複数あるときはスレッドプールで各モデルの predict を並列実行できる。
+# モデル数が少ないとスレッド投入のオーバーヘッドが勝るので下限を設ける。
+_PREDICT_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+_MIN_MODELS_FOR_PARALLEL = 4
+
+
+# ウォーム実行間で TCP/TLS コネクションを再利用するためのモジュールレベル Session。
+# keepalive + gzip + 軽いリトライ付き。タイムアウトは (接続, 読み取り) 秒。
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.headers.update({"Accept-Encoding": "gzip"})
+_HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+))
+_HTTP_TIMEOUT = (3, 5)
+
+# OpenWeather の予報は1〜3時間ごとにしか更新されないため、
+# 同一プロセス内の連続呼び出しでは取得済みレスポンスを30分単位で再利用する
+_FORECAST_CACHE_TTL_SECONDS = 1800
+
+# --- タイマー関数が書き出す予報キャッシュ Blob ---
+# openweather-function が毎日 forecasts/latest.json に最新の予報リストを
+# アップロードしている。リクエスト時はまずこの Blob を読み（約5ms）、
+# 無い/古い場合のみ OpenWeather API（数百ms）にフォールバックする。
+_FORECAST_BLOB_CONTAINER = "forecasts"
+_FORECAST_BLOB_NAME = "latest.json"
+_FORECAST_BLOB_MAX_AGE_SECONDS = 86400
+_STORAGE_CONNECTION_STRING = os.environ.get("AzureWebJobsStorage")
+
+try:
+    from azure.storage.blob import BlobClient
+except ImportError:
+    BlobClient = None
+
+
+def _fetch_forecast_from_blob():
+    """予報キャッシュ Blob を読み込む。未設定・未作成・期限切れなら None。"""
+    if BlobClient is None or not _STORAGE_CONNECTION_STRING:
+        return None
+    try:
+        blob = BlobClient.from_connection_string(
+            _STORAGE_CONNECTION_STRING,
+            container_name=_FORECAST_BLOB_CONTAINER,
+            blob_name=_FORECAST_BLOB_NAME
+        )
+        cached = _json_loads(blob.download_blob().readall())
+        cached_at = datetime.fromisoformat(cached["cached_at"])
+        if (datetime.utcnow() - cached_at).total_seconds() > _FORECAST_BLOB_MAX_AGE_SECONDS:
+            logging.info("Forecast cache blob is stale. Falling back to OpenWeather API.")
+            return None
+        return cached
+    except Exception as e:
+        logging.info(f"Forecast cache blob unavailable ({e}). Falling back to OpenWeather API.")
+        return None
+
+
+@lru_cache(maxsize=4)
+def _fetch_forecast(city, time_bucket):
+    """OpenWeather の5日間予報JSONを取得する。
+
+    time_bucket は TTL 単位に量子化した時刻で、同じバケット内の呼び出しは
+    lru_cache によりキャッシュ済みレスポンスを返す。
+    """
+    weather_url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={OPENWEATHER_API_KEY}&units=metric&lang=ja"
+    weather_response = _HTTP_SESSION.get(weather_url, timeout=_HTTP_TIMEOUT)
+    weather_response.raise_for_status() # HTTPエラーがあれば例外を発生させる
+    return _json_loads(weather_response.content)
+
+# onnxruntime が使える環境では、joblib と並んで ONNX 形式のモデルも扱える。
+# ONNX の推論は C++ 側で完結して GIL も解放するため、sklearn の predict より
+# 呼び出しオーバーヘッドが小さい（skl2onnx で変換したモデルを置くだけでよい）
+try:
+    import onnxruntime as ort
+
+    class _OnnxModel:
+        """InferenceSession を sklearn 互換の .predict に包む薄いラッパー。"""
+
+        def __init__(self, path):
+            self._session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+            self._input_name = self._session.get_inputs()[0].name
+
+        def predict(self, X):
+            return self._session.run(None, {self._input_name: np.asarray(X, dtype=np.float32)})[0].ravel()
+except ImportError:
+    ort = None
+
+
+def _load_model(path):
+    """拡張子に応じて joblib / ONNX のどちらかでモデルを読み込む。"""
+    if path.endswith(".onnx"):
+        if ort is None:
+            raise RuntimeError(f"onnxruntime is not installed; cannot load {path}")
+        return _OnnxModel(path)
+    # mmap_mode='r' でモデル内の numpy 配列をメモリマップし、
+    # コールドスタート時のロードとプロセスごとの常駐メモリを抑える
+    return joblib.load(path, mmap_mode="r")
+
+
 # --- アプリケーション起動時にモデルを読み込むロジック ---
 # このコードは関数アプリが起動する際に一度だけ実行される
 try:
     model_base_path = os.path.join(os.path.dirname(__file__), "models")
-    
-    customer_model_files = {
-        "来客数": "来客数_model.joblib",
-        "総杯数": "総杯数_model.joblib"
-    }
-    for key, filename in customer_model_files.items():
-        model_path = os.path.join(model_base_path, filename)
-        if os.path.exists(model_path):
-            CUSTOMER_MODELS[key] = joblib.load(model_path)
-            logging.info(f"Loaded customer model: {key} from {model_path}")
-        else:
-            logging.warning(f"Customer model not found: {model_path}. Prediction for {key} might use averages.")
-
-    # BEER_MODELS のキーは学習時のターゲット列名に合わせる (例: "IPA(本)")
-    # modelsディレクトリ内の .joblib ファイルを動的に検出する
-    for filename in os.listdir(model_base_path):
-        if filename.endswith("_model.joblib") and not filename.startswith(("来客数_", "総杯数_")):
+    manifest_path = os.path.join(model_base_path, "manifest.json")
+
+    if os.path.exists(manifest_path):
+        # モデル学習時に生成した manifest.json (モデル名→ファイル名) から読み込む。
+        # Azure Files 上では listdir がファイルごとに stat を往復するため、
+        # JSON 1回の読み込みで済ませる方が速く、ファイル名のプレフィックス規約にも
+        # 依存しない。例: {"customer": {"来客数": "来客数_model.joblib", ...},
+        #                  "beer": {"IPA(本)": "IPA_model.joblib", ...}}
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = _json_loads(f.read())
+        for key, filename in manifest.get("customer", {}).items():
+            CUSTOMER_MODELS[key] = _load_model(os.path.join(model_base_path, filename))
+            logging.info(f"Loaded customer model: {key} from {filename}")
+        for key, filename in manifest.get("beer", {}).items():
+            BEER_MODELS[key] = _load_model(os.path.join(model_base_path, filename))
+            logging.info(f"Loaded beer model: {key} from {filename}")
+    else:
+        # manifest がない場合は従来どおりディレクトリを走査して検出する
+        customer_model_files = {
+            "来客数": "来客数_model.joblib",
+            "総杯数": "総杯数_model.joblib"
+        }
+        for key, filename in customer_model_files.items():
             model_path = os.path.join(model_base_path, filename)
-            beer_key = filename.replace("_model.joblib", "").strip() + "(本)"
-            BEER_MODELS[beer_key] = joblib.load(model_path)
-            logging.info(f"Loaded beer model: {beer_key} from {model_path}")
+            if os.path.exists(model_path):
+                CUSTOMER_MODELS[key] = _load_model(model_path)
+                logging.info(f"Loaded customer model: {key} from {model_path}")
+            else:
+                logging.warning(f"Customer model not found: {model_path}. Prediction for {key} might use averages.")
+
+        # BEER_MODELS のキーは学習時のターゲット列名に合わせる (例: "IPA(本)")
+        # modelsディレクトリ内の .joblib ファイルを動的に検出する
+        for filename in os.listdir(model_base_path):
+            if filename.endswith("_model.joblib") and not filename.startswith(("来客数_", "総杯数_")):
+                model_path = os.path.join(model_base_path, filename)
+                beer_key = filename.replace("_model.joblib", "").strip() + "(本)"
+                BEER_MODELS[beer_key] = _load_model(model_path)
+                logging.info(f"Loaded beer model: {beer_key} from {model_path}")
 
 except Exception as e:
     logging.error(f"Error loading models at application startup: {e}")
 
+# ビール名の並びは起動後は変わらないので、リクエストごとに
+# list(BEER_MODELS.keys()) を作り直さずタプルで固定しておく
+BEER_KEYS = tuple(BEER_MODELS)
+
+# sklearn/numpy の遅延初期化（内部キャッシュや SIMD ディスパッチ等）のコストを
+# 初回リクエストではなく起動時に払うよう、ダミー入力で一度 predict して温めておく
+try:
+    _dummy_base = np.zeros((1, len(BASE_FEATURES)), dtype=np.float32)
+    for _model in CUSTOMER_MODELS.values():
+        _model.predict(_dummy_base)
+    _dummy_full = np.zeros((1, len(FEATURE_COLS)), dtype=np.float32)
+    for _model in BEER_MODELS.values():
+        _model.predict(_dummy_full)
+except Exception as e:
+    logging.warning(f"Model warm-up prediction failed: {e}")
+
 # --- HTTPトリガー関数 'get_order_recommendations' を定義 ---
 @app.route(route="get_order_recommendations", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
 def get_order_recommendations(req: func.HttpRequest) -> func.HttpResponse:
@@ -73,7 +254,7 @@ def get_order_recommendations(req: func.HttpRequest) -> func.HttpResponse:
     if not CUSTOMER_MODELS or not BEER_MODELS:
         logging.error("Prediction models are not fully loaded. Cannot process request.")
         return func.HttpResponse(
-            json.dumps({"error": "Prediction models are not ready. Please check application startup logs for errors."}),
+            _json_dumps({"error": "Prediction models are not ready. Please check application startup logs for errors."}),
             mimetype="application/json",
             status_code=500
         )
@@ -83,162 +264,160 @@ def get_order_recommendations(req: func.HttpRequest) -> func.HttpResponse:
     # ここでは最大5日分の予測データを集めることを試みる
     forecast_days_to_collect = 5
     
-    forecast_data_list = []
+    # 特徴量は DataFrame を介さず、列指向の ndarray として直接組み立てる
+    # （5行程度の DataFrame 構築と型推論のコストを丸ごと省く）
+    forecast_dates = np.empty(0, dtype="datetime64[D]")
+    X_base = np.empty((0, len(BASE_FEATURES)), dtype=np.float32)
     try:
         if not OPENWEATHER_API_KEY:
             raise ValueError("OpenWeather API Key is not configured.")
 
-        weather_url = f"https://api.openweathermap.org/data/2.5/forecast?q={OPENWEATHER_CITY}&appid={OPENWEATHER_API_KEY}&units=metric&lang=ja"
-        weather_response = requests.get(weather_url)
-        weather_response.raise_for_status() # HTTPエラーがあれば例外を発生させる
-        weather_data = weather_response.json()
-
-        processed_dates = set()
-        if weather_data.get("list"):
-            for entry in weather_data["list"]:
-                dt_obj = datetime.fromtimestamp(entry["dt"])
-                current_date = dt_obj.date()
-
-                # 正午のデータのみを使用し、まだ処理していない日付、かつ指定日数未満
-                # かつ、日曜日でない（店舗は日曜日が定休日）
-                if (dt_obj.hour == 12 and 
-                    current_date not in processed_dates and 
-                    len(processed_dates) < forecast_days_to_collect):
-                    
-                    if dt_obj.weekday() == 6: # 月=0, 日=6 (Sunday)
-                        logging.info(f"Skipping Sunday (holiday): {current_date.strftime('%Y-%m-%d')}")
-                        continue # 日曜日は定休日なので予測対象からスキップ
-
-                    desc = entry["weather"][0]["description"].lower()
-                    weather_code = WEATHER_CODE_MAP.get(desc, 3) # マッピングにない場合は'曇り' (3) とする
-
-                    forecast_data_list.append({
-                        "日付": current_date, # datetime.dateオブジェクトのまま保持
-                        "平均気温(℃)": entry["main"]["temp"],
-                        "曜日": dt_obj.weekday(),
-                        "月": dt_obj.month,
-                        "天気(1-5)": weather_code
-                    })
-                    processed_dates.add(current_date)
-                
-                # 必要な日数分のデータを取得したらループを終了
-                if len(processed_dates) >= forecast_days_to_collect:
-                    break
+        # タイマー関数が用意した予報キャッシュ Blob を優先し、
+        # 使えないときだけ OpenWeather API を直接呼ぶ
+        weather_data = _fetch_forecast_from_blob()
+        if weather_data is None:
+            weather_data = _fetch_forecast(OPENWEATHER_CITY, int(time.time() // _FORECAST_CACHE_TTL_SECONDS))
+
+        entries = weather_data.get("list") or []
+        if entries:
+            # エポック秒をまとめてローカル時刻に直し、正午かつ日曜以外の
+            # エントリを numpy で一括選別する（エントリごとの
+            # datetime.fromtimestamp 呼び出しと Python ループを排除）。
+            # 3時間ごとの予報なので正午は1日に1エントリしか現れない。
+            utc_offset_s = int(datetime.now().astimezone().utcoffset().total_seconds())
+            local_ts = np.array([e["dt"] for e in entries], dtype=np.int64) + utc_offset_s
+            hours = (local_ts // 3600) % 24
+            local_days = local_ts // 86400
+            dows = (local_days + 3) % 7  # 1970-01-01は木曜 → 月=0, 日=6 に補正
+
+            # 正午、かつ日曜日でない（店舗は日曜日が定休日）エントリを先頭から指定日数分
+            noon_indices = np.flatnonzero((hours == 12) & (dows != 6))[:forecast_days_to_collect]
+            if noon_indices.size:
+                forecast_dates = local_days[noon_indices].astype("datetime64[D]")
+                noon_months = forecast_dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+                noon_entries = [entries[i] for i in noon_indices.tolist()]
+
+                # BASE_FEATURES の並び (平均気温, 曜日, 月, 天気) で特徴量行列を直接構築
+                X_base = np.column_stack([
+                    np.array([e["main"]["temp"] for e in noon_entries], dtype=np.float32),
+                    dows[noon_indices].astype(np.float32),
+                    noon_months.astype(np.float32),
+                    np.array([_weather_code_from_id(e["weather"][0]["id"]) for e in noon_entries],
+                             dtype=np.float32)
+                ])
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching weather data from OpenWeather API: {e}")
         return func.HttpResponse(
-            json.dumps({"error": f"Failed to fetch weather data: {str(e)}."}),
+            _json_dumps({"error": f"Failed to fetch weather data: {str(e)}."}),
             mimetype="application/json",
             status_code=500
         )
     except ValueError as e:
         logging.error(f"Configuration error: {e}")
         return func.HttpResponse(
-            json.dumps({"error": f"Server configuration error: {str(e)}"}),
+            _json_dumps({"error": f"Server configuration error: {str(e)}"}),
             mimetype="application/json",
             status_code=500
         )
     except Exception as e:
         logging.error(f"Error processing weather data: {e}")
         return func.HttpResponse(
-            json.dumps({"error": f"An unexpected error occurred while processing weather data: {str(e)}."}),
+            _json_dumps({"error": f"An unexpected error occurred while processing weather data: {str(e)}."}),
             mimetype="application/json",
             status_code=500
         )
 
-    if not forecast_data_list:
+    if forecast_dates.size == 0:
         logging.error("No valid weather forecast data could be retrieved for the specified period.")
         return func.HttpResponse(
-            json.dumps({"error": "No valid forecast data available for calculation. Please check OpenWeather API configuration."}),
+            _json_dumps({"error": "No valid forecast data available for calculation. Please check OpenWeather API configuration."}),
             mimetype="application/json",
             status_code=404
         )
 
-    # Pandas DataFrameに変換して予測の準備
-    daily_forecast_df = pd.DataFrame(forecast_data_list)
-
     # --- 来客数・総杯数予測 ---
     # customer_models が正常に読み込まれていればそれを使用、そうでなければ学習時の平均値を使用
     if "来客数" in CUSTOMER_MODELS:
-        daily_forecast_df["来客数"] = np.round(CUSTOMER_MODELS["来客数"].predict(daily_forecast_df[BASE_FEATURES])).astype(int)
+        # rint を predict 結果に in-place 適用してから int32 化する
+        # （丸め用の中間配列を作らず、int64 の倍のメモリも使わない）
+        preds = CUSTOMER_MODELS["来客数"].predict(X_base)
+        visitors = np.rint(preds, out=preds).astype(np.int32)
     else:
         logging.warning("来客数 prediction model not loaded. Using average for 来客数.")
-        daily_forecast_df["来客数"] = AVG_VISITORS
-    
+        visitors = np.full(forecast_dates.size, AVG_VISITORS, dtype=np.int32)
+
     if "総杯数" in CUSTOMER_MODELS:
-        daily_forecast_df["総杯数"] = np.round(CUSTOMER_MODELS["総杯数"].predict(daily_forecast_df[BASE_FEATURES])).astype(int)
+        preds = CUSTOMER_MODELS["総杯数"].predict(X_base)
+        cups = np.rint(preds, out=preds).astype(np.int32)
     else:
         logging.warning("総杯数 prediction model not loaded. Using average for 総杯数.")
-        daily_forecast_df["総杯数"] = AVG_CUPS
-
-    # --- 各ビール販売数予測を実行し、daily_forecast_df に 'predicted_beers' 列として追加 ---
-    # このステップで、各日付ごとの予測されたビール販売量を辞書形式で格納する新しい列を作成。
-    # 発注量計算時にこの列から各ビールの予測量を参照する。
-    
-    # 予測対象となる全てのビールタイプ (例: "IPA(本)", "Lager(本)", ...)
-    all_beer_types = list(BEER_MODELS.keys())
-    
-    # 各日付ごとにビールの予測を実行し、'predicted_beers'列に辞書として格納
-    daily_forecast_df['predicted_beers'] = daily_forecast_df.apply(
-        lambda row: {
-            beer_key_full: max(0, int(np.round(BEER_MODELS[beer_key_full].predict(pd.DataFrame([row[FEATURE_COLS]])))))
-            if beer_key_full in BEER_MODELS else 0
-            for beer_key_full in all_beer_types # 全ての学習済みビールタイプに対して予測を試みる
-        }, axis=1
-    )
+        cups = np.full(forecast_dates.size, AVG_CUPS, dtype=np.int32)
 
+    # --- 各ビール販売数予測 (BEER_KEYS の並びで beer_preds の列に対応) ---
+    # 各モデルにつき predict を1回だけ呼び、全日付分をまとめて予測する。
+    # 入力は FEATURE_COLS の並び (来客数, 総杯数, 基本特徴量) で結合した行列。
+    # int32 列を先に float32 化しておくと column_stack が float64 へ昇格せず、
+    # 行列全体が float32 のまま（float64 比でメモリ帯域が半分）になる。
+    X_full = np.column_stack([
+        visitors.astype(np.float32), cups.astype(np.float32), X_base
+    ])
+    if len(BEER_KEYS) >= _MIN_MODELS_FOR_PARALLEL:
+        # モデルごとの predict をスレッドプールに投げ、複数コアで並列実行する
+        futures = [_PREDICT_POOL.submit(BEER_MODELS[k].predict, X_full) for k in BEER_KEYS]
+        raw_beer_preds = [f.result() for f in futures]
+    else:
+        raw_beer_preds = [BEER_MODELS[k].predict(X_full) for k in BEER_KEYS]
+    beer_preds = _clamp_round_i32(np.column_stack(raw_beer_preds))  # shape: (日数, ビール種類数)
 
     # --- 発注量計算（週2回: 月・木） ---
     order_recommendations_output = []
 
-    # 今日の日付を基準に、次の月曜日と木曜日を計算
-    current_today_date = datetime.now().date()
-    next_monday_order_day = current_today_date + timedelta(days=(0 - current_today_date.weekday() + 7) % 7)
-    next_thursday_order_day = current_today_date + timedelta(days=(3 - current_today_date.weekday() + 7) % 7)
-    
+    # 今日の日付を基準に、次の月曜日と木曜日を計算（今日が当該曜日なら今日）。
+    # datetime64[D] のまま扱うことで、期間フィルタの forecast_dates との比較が
+    # 変換なしの numpy 比較になる。
+    current_today_date = np.datetime64(datetime.now().date(), "D")
+    next_monday_order_day = np.busday_offset(current_today_date, 0, roll="forward", weekmask="1000000")
+    next_thursday_order_day = np.busday_offset(current_today_date, 0, roll="forward", weekmask="0001000")
+
+
     # 発注量計算ヘルパー関数
     # この関数は、指定された日付範囲内のビールの合計予測量を計算
-    # daily_forecast_df には既に日曜日が除外されたデータと、予測結果の 'predicted_beers' 列が存在する前提
+    # forecast_dates / beer_preds には既に日曜日が除外されたデータが入っている前提
     def calculate_order_period_sum(start_date, end_date):
-        period_df = daily_forecast_df[
-            (daily_forecast_df["日付"] >= start_date) & 
-            (daily_forecast_df["日付"] <= end_date)
-        ]
-        
-        period_sums = {}
-        if not period_df.empty:
-            for beer_key_full in all_beer_types:
-                # 'predicted_beers' 列の辞書から各ビールの予測量を取得し、合計
-                total_quantity = period_df["predicted_beers"].apply(lambda x: x.get(beer_key_full, 0)).sum()
-                period_sums[beer_key_full] = int(total_quantity) # 整数に変換
-        return period_sums
+        mask = (forecast_dates >= start_date) & (forecast_dates <= end_date)
+        if not mask.any():
+            return {}
+        # 期間内の行を軸0方向に合計し、tolist で一括して Python int へ変換する
+        # （ビールごとに int(np.int32) を呼ぶより1回のCループで済む）
+        totals = beer_preds[mask].sum(axis=0)
+        return dict(zip(BEER_KEYS, totals.tolist()))
 
     # 月曜日発注分 (火〜木曜日分の予測を合計)
     # 翌日納品なので、月曜に発注→火曜着。火・水・木曜日分の需要をカバー
-    monday_order_start = next_monday_order_day + timedelta(days=1)
-    monday_order_end = next_monday_order_day + timedelta(days=3)
+    monday_order_start = next_monday_order_day + 1
+    monday_order_end = next_monday_order_day + 3
     monday_order_sums = calculate_order_period_sum(monday_order_start, monday_order_end)
     if monday_order_sums:
         order_recommendations_output.append({
-            "order_date": next_monday_order_day.strftime("%Y-%m-%d"),
+            "order_date": str(next_monday_order_day),
             "order_day_label": "月",
-            "coverage_period_start": monday_order_start.strftime("%Y-%m-%d"),
-            "coverage_period_end": monday_order_end.strftime("%Y-%m-%d"),
+            "coverage_period_start": str(monday_order_start),
+            "coverage_period_end": str(monday_order_end),
             "ordered_beers": monday_order_sums
         })
 
     # 木曜日発注分 (金〜翌月曜日分の予測を合計)
     # 翌日納品なので、木曜に発注→金曜着。金・土・月曜日分の需要をカバー（日曜は定休日なので予測データにない前提）
-    thursday_order_start = next_thursday_order_day + timedelta(days=1)
-    thursday_order_end = next_thursday_order_day + timedelta(days=4)
+    thursday_order_start = next_thursday_order_day + 1
+    thursday_order_end = next_thursday_order_day + 4
     thursday_order_sums = calculate_order_period_sum(thursday_order_start, thursday_order_end)
     if thursday_order_sums:
         order_recommendations_output.append({
-            "order_date": next_thursday_order_day.strftime("%Y-%m-%d"),
+            "order_date": str(next_thursday_order_day),
             "order_day_label": "木",
-            "coverage_period_start": thursday_order_start.strftime("%Y-%m-%d"),
-            "coverage_period_end": thursday_order_end.strftime("%Y-%m-%d"),
+            "coverage_period_start": str(thursday_order_start),
+            "coverage_period_end": str(thursday_order_end),
             "ordered_beers": thursday_order_sums
         })
 
@@ -251,7 +430,7 @@ def get_order_recommendations(req: func.HttpRequest) -> func.HttpResponse:
 
     # JSONレスポンスを返す
     return func.HttpResponse(
-        json.dumps(final_response, ensure_ascii=False, indent=2), # ensure_ascii=Falseで日本語文字化けを防ぐ, indentで整形
+        _json_dumps(final_response),
         mimetype="application/json",
         status_code=200
     )
@@ -1,11 +1,18 @@
 import logging
 import azure.functions as func
+import json
 import os
 import requests
-import psycopg2
-from psycopg2 import Error
+from requests.adapters import HTTPAdapter, Retry
+from psycopg2 import Error, pool
 from datetime import datetime, timedelta
 
+# 予報キャッシュの Blob アップロードに使う（SDK が無い環境では単にスキップする）
+try:
+    from azure.storage.blob import BlobClient
+except ImportError:
+    BlobClient = None
+
 app = func.FunctionApp()
 
 # --- 環境変数から設定を取得 ---
@@ -18,13 +25,82 @@ DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASSWORD = os.environ.get("DB_PASSWORD")
 
-# --- 天気コードのマッピング (beer-forecast-model-functionと同じもの) ---
-WEATHER_CODE_MAP = {
-    "thunderstorm": 1, "drizzle": 1, "rain": 1, "light rain": 1,
-    "moderate rain": 1, "shower rain": 1, "overcast clouds": 2,
-    "broken clouds": 2, "scattered clouds": 3, "few clouds": 4,
-    "clear sky": 5
-}
+# --- ウォーム実行間で TCP/TLS コネクションを再利用するためのモジュールレベル Session ---
+# keepalive + gzip + 軽いリトライ付き。タイムアウトは (接続, 読み取り) 秒。
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.headers.update({"Accept-Encoding": "gzip"})
+_HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4, pool_maxsize=4,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+))
+_HTTP_TIMEOUT = (3, 5)
+
+# --- プロセスレベルの PostgreSQL コネクションプール ---
+# タイマー起動のたびに psycopg2.connect すると DNS+TLS+認証で数百ms かかるため、
+# ウォーム実行間でコネクションを再利用する。DB の環境変数が未設定でも
+# インポートが失敗しないよう、初回利用時に遅延生成する。
+_PG_POOL = None
+
+# --- 予報キャッシュの書き出し先 Blob ---
+# beer-forecast 側がリクエストのたびに OpenWeather API を呼ばずに済むよう、
+# タイマー実行ごとに最新の予報リストをまるごと Blob に書き出しておく
+FORECAST_BLOB_CONTAINER = "forecasts"
+FORECAST_BLOB_NAME = "latest.json"
+STORAGE_CONNECTION_STRING = os.environ.get("AzureWebJobsStorage")
+
+
+def _save_forecast_to_blob(weather_data):
+    """取得済みの予報JSONを forecasts/latest.json へアップロードする。
+
+    キャッシュは高速化のための冗長データなので、失敗しても警告ログに留めて
+    本来の DB 保存処理は続行する。
+    """
+    if BlobClient is None or not STORAGE_CONNECTION_STRING:
+        logging.info("Blob storage is not configured. Skipping forecast cache upload.")
+        return
+    try:
+        blob = BlobClient.from_connection_string(
+            STORAGE_CONNECTION_STRING,
+            container_name=FORECAST_BLOB_CONTAINER,
+            blob_name=FORECAST_BLOB_NAME
+        )
+        payload = json.dumps({
+            "cached_at": datetime.utcnow().isoformat(),
+            "list": weather_data.get("list", [])
+        }, ensure_ascii=False)
+        blob.upload_blob(payload, overwrite=True)
+        logging.info(f"Uploaded forecast cache to {FORECAST_BLOB_CONTAINER}/{FORECAST_BLOB_NAME}.")
+    except Exception as e:
+        logging.warning(f"Failed to upload forecast cache blob: {e}")
+
+def _get_pg_pool():
+    global _PG_POOL
+    if _PG_POOL is None:
+        _PG_POOL = pool.ThreadedConnectionPool(
+            minconn=1, maxconn=2,
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD
+        )
+    return _PG_POOL
+
+# --- 天気コードの判定 (beer-forecast-model-functionと同じもの) ---
+# OpenWeather の数値 id から天気コード (1-5) を求める。
+# id の区分は安定している (2xx=雷雨, 3xx=霧雨, 5xx=雨, 6xx=雪, 7xx=大気現象,
+# 800=快晴, 80x=雲)。以前の説明文字列→コードの辞書引きは、辞書にない文言が
+# すべて「曇り」扱いになる欠点があった。
+def _weather_code_from_id(weather_id):
+    if weather_id < 700:
+        return 1  # 雷雨・霧雨・雨・雪
+    if weather_id == 800:
+        return 5  # 快晴
+    if weather_id >= 803:
+        return 2  # 曇天
+    if weather_id == 802:
+        return 3  # 散らばった雲
+    return 4  # 薄い雲 (801)・大気現象 (7xx)
 
 # --- 曜日のマッピング (Pythonのweekday()は月曜日=0, 日曜日=6) ---
 WEEKDAY_MAP = {
@@ -54,18 +130,21 @@ def collect_weather_data(myTimer: func.TimerRequest) -> None:
     target_weather_data = None
     try:
         weather_url = f"https://api.openweathermap.org/data/2.5/forecast?q={OPENWEATHER_CITY}&appid={OPENWEATHER_API_KEY}&units=metric&lang=ja"
-        weather_response = requests.get(weather_url)
+        weather_response = _HTTP_SESSION.get(weather_url, timeout=_HTTP_TIMEOUT)
         weather_response.raise_for_status() # HTTPエラー（4xx, 5xx）があれば例外を発生
         weather_data = weather_response.json()
 
+        # 予報リストを Blob にキャッシュし、HTTP トリガー側の API 呼び出しを不要にする
+        _save_forecast_to_blob(weather_data)
+
         if weather_data.get("list"):
             for entry in weather_data["list"]:
                 dt_obj = datetime.fromtimestamp(entry["dt"])
                 # その日の正午のデータを探す
                 if dt_obj.date() == today_date and dt_obj.hour == 12:
-                    desc = entry["weather"][0]["description"].lower()
-                    weather_code = WEATHER_CODE_MAP.get(desc, 3) # マッピングにない場合は'曇り' (3) とする
-                    
+                    weather_code = _weather_code_from_id(entry["weather"][0]["id"])
+
+
                     target_weather_data = {
                         "record_date": today_date,
                         "avg_temp_c": entry["main"]["temp"],
@@ -91,13 +170,7 @@ def collect_weather_data(myTimer: func.TimerRequest) -> None:
     conn = None
     cursor = None
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
+        conn = _get_pg_pool().getconn()
         cursor = conn.cursor()
 
         insert_sql = """
@@ -129,6 +202,6 @@ def collect_weather_data(myTimer: func.TimerRequest) -> None:
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
+            _get_pg_pool().putconn(conn) # クローズせずプールに返却
 
     logging.info('Python timer trigger function completed.')